@@ -3,14 +3,13 @@ import guidance
 import re
 
 from tqdm import tqdm
+from collections import OrderedDict
 from abc import ABC, abstractmethod
-from pydantic import BaseModel, model_validator
-from typing import List, Dict, Optional, Tuple, Any, Callable
+from pydantic import BaseModel, model_validator, PrivateAttr
+from typing import List, Dict, Optional, Tuple, Any, Callable, ClassVar
 from adala.datasets.base import InternalDataFrame
 from adala.utils.logs import print_text
 
-tqdm.pandas()
-
 
 class Runtime(BaseModel, ABC):
     """
@@ -51,9 +50,14 @@ class LLMRuntime(Runtime):
     Attributes:
         llm_runtime_type (LLMRuntimeModelType): Type of the LLM runtime. Defaults to OpenAI.
         llm_params (Dict[str, str]): Parameters for the LLM runtime. Defaults to a basic GPT-3.5 configuration.
+        max_parallel (int): Maximum number of batches processed concurrently by skills. Defaults to 1 (sequential).
+                            Increase it to overlap network round-trips, within the provider rate limits.
     
         _llm: Internal instance for the LLM model. Initialized in `init_runtime`.
         _program: Program instance used for guidance. Initialized in `init_runtime`.
+        _programs (dict): Compiled template programs keyed by template and silent flag,
+                          up to `_PROGRAMS_MAX_SIZE` most recently used ones.
+                          Reset in `init_runtime` together with the LLM instance they are bound to.
         _llm_template (str): Template string for LLM guidance.
     """
     llm_runtime_type: LLMRuntimeType = LLMRuntimeType.STUDENT
@@ -63,8 +67,11 @@ class LLMRuntime(Runtime):
         # 'max_tokens': 10,
         # 'temperature': 0,
     }
+    max_parallel: int = 1
     _llm = None
     _program = None
+    _programs: Dict[Tuple[str, Optional[bool]], Callable] = PrivateAttr(default_factory=OrderedDict)
+    _PROGRAMS_MAX_SIZE: ClassVar[int] = 256
     # do not override this template
     _llm_template: str = '''\
 {{>instructions_program}}
@@ -84,6 +91,29 @@ class LLMRuntime(Runtime):
         else:
             raise NotImplementedError(f'LLM runtime type {self.llm_runtime_model_type} is not implemented.')
         self._program = guidance(self._llm_template, llm=self._llm, silent=not self.verbose)
+        self._programs = OrderedDict()
+
+    def _compile_program(self, template: str, silent: Optional[bool] = None) -> Callable:
+        """Creates a guidance program from the template, reusing the one compiled before if any.
+
+        Args:
+            template (str): Program template.
+            silent (bool, optional): Whether to suppress program outputs.
+
+        Returns:
+            callable: The guidance program.
+        """
+        # templates embed skill instructions that change on every improvement, so the cache is bounded
+        programs = self._programs
+        key = (template, silent)
+        # pop and reinsert to mark the program as recently used
+        program = programs.pop(key, None)
+        if program is None:
+            program = guidance(template, llm=self._llm, silent=silent)
+        programs[key] = program
+        while len(programs) > self._PROGRAMS_MAX_SIZE:
+            programs.popitem(last=False)
+        return program
 
     def init_runtime(self) -> 'LLMRuntime':
         """Initializes the LLM runtime environment.
@@ -117,7 +147,8 @@ class LLMRuntime(Runtime):
         record,
         program,
         extra_fields,
-        outputs=None
+        outputs=None,
+        output_column_map=None
     ) -> Dict[str, Any]:
 
         """Processes a single record using the guidance program.
@@ -127,6 +158,7 @@ class LLMRuntime(Runtime):
             program (callable): The guidance program for processing.
             extra_fields (dict, optional): Additional fields to include in the processed record.
             outputs (list of str, optional): Specific output fields to extract from the result.
+            output_column_map (dict, optional): Mapping of output fields to the names used in the processed output.
 
         Returns:
             dict: Processed output for the record.
@@ -151,7 +183,8 @@ class LLMRuntime(Runtime):
         if not outputs:
             verified_output = {'': str(result)}
         else:
-            verified_output = {field: result[field] for field in outputs}
+            output_column_map = output_column_map or {}
+            verified_output = {output_column_map.get(field, field): result[field] for field in outputs}
 
         return verified_output
 
@@ -169,7 +202,7 @@ class LLMRuntime(Runtime):
         fixed_input_template = input_template
         if '{{text}}' in fixed_input_template:
             fixed_input_template = fixed_input_template.replace('{{text}}', '{{text_}}')
-        input_program = guidance(fixed_input_template, llm=self._llm, silent=not self.verbose)
+        input_program = self._compile_program(fixed_input_template, silent=not self.verbose)
         return input_program
 
     def get_output_program(self, output_template) -> Callable:
@@ -182,7 +215,7 @@ class LLMRuntime(Runtime):
             callable: The generated output program.
         """
         
-        output_program = guidance(output_template, llm=self._llm)
+        output_program = self._compile_program(output_template)
         return output_program
 
     def get_instructions_program(self, instructions) -> Callable:
@@ -195,7 +228,7 @@ class LLMRuntime(Runtime):
             callable: The generated instructions program.
         """
         
-        instructions_program = guidance(instructions, llm=self._llm)
+        instructions_program = self._compile_program(instructions)
         return instructions_program
 
     def _prepare_program_and_params(self, input_template, output_template, instructions, extra_fields):
@@ -250,6 +283,7 @@ class LLMRuntime(Runtime):
         output_template: Optional[str] = None,
         instructions: Optional[str] = None,
         extra_fields: Optional[Dict[str, Any]] = None,
+        output_column_map: Optional[Dict[str, str]] = None,
     ) -> InternalDataFrame:
         """Processes a batch of records using the provided templates and instructions.
 
@@ -259,6 +293,7 @@ class LLMRuntime(Runtime):
             output_template (str): Template for output processing.
             instructions (str): Instructions for guidance.
             extra_fields (Dict[str, Any], optional): Additional fields to include during batch processing.
+            output_column_map (Dict[str, str], optional): Mapping of output fields to the output column names.
 
         Returns:
             InternalDataFrame: The processed batch of records.
@@ -266,14 +301,20 @@ class LLMRuntime(Runtime):
         
         outputs = self.get_outputs(output_template)
         program, extra_fields = self._prepare_program_and_params(input_template, output_template, instructions, extra_fields)
-        output = batch.progress_apply(
-            self._process_record,
-            axis=1,
-            result_type='expand',
-            program=program,
-            outputs=outputs,
-            extra_fields=extra_fields
-        )
+        # iterate over columns instead of materializing a Series per row,
+        # tolist() keeps pandas scalars (e.g. Timestamp) so that values render as before
+        columns = batch.columns.tolist()
+        rows = zip(*(batch[column].tolist() for column in columns))
+        output = InternalDataFrame([
+            self._process_record(
+                record=dict(zip(columns, row)),
+                program=program,
+                outputs=outputs,
+                extra_fields=extra_fields,
+                output_column_map=output_column_map
+            )
+            for row in tqdm(rows, total=len(batch))
+        ], index=batch.index)
         return output
 
 
@@ -1,20 +1,64 @@
-import openai
-import pandas as pd
+import functools
+import hashlib
+import json
+import numpy as np
 import re
 
 from pydantic import BaseModel
-from typing import List, Optional, Any, Dict, Tuple, Union
+from typing import List, Optional, Any, Dict, Tuple, Union, Iterator, ClassVar, FrozenSet, Sequence
 from abc import ABC, abstractmethod
-from pydantic import Field, model_validator
+from pydantic import Field, PrivateAttr, model_validator
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque, OrderedDict
 
 from typing import Optional
 from adala.runtimes.base import LLMRuntime
 from adala.datasets import Dataset, DataFrameDataset
 from adala.runtimes.base import Runtime
 from adala.memories.base import Memory
-from adala.utils.internal_data import InternalDataFrame, InternalDataFrameConcat
+from adala.utils.internal_data import InternalDataFrame, InternalSeries, InternalDataFrameConcat
 from adala.utils.logs import print_error
 
+# plain field substitution in handlebars templates, e.g. "{{text}}"
+_TEMPLATE_FIELD_RE = re.compile(r'{{\s*([a-zA-Z_]\w*)\s*}}')
+# constrained generation in handlebars templates, e.g. "{{select 'label' options=labels}}"
+_TEMPLATE_SELECT_RE = re.compile(r'{{~?\s*select\b')
+
+
+@functools.lru_cache(maxsize=256)
+def _split_template(template: str) -> Optional[Tuple[str, ...]]:
+    """
+    Splits a template into `(literal, field, literal, field, ..., literal)`.
+
+    Args:
+        template (str): Handlebars template.
+
+    Returns:
+        Optional[Tuple[str, ...]]: Template parts, or None if the template contains anything else
+            than plain field substitutions.
+    """
+    parts = _TEMPLATE_FIELD_RE.split(template)
+    if any('{{' in literal or '}}' in literal for literal in parts[::2]):
+        return None
+    return tuple(parts)
+
+
+def _render_template_batch(parts: Sequence[str], columns: List[Sequence[Any]]) -> List[str]:
+    """
+    Renders a template pre-split into `(literal, field, literal, ..., literal)` for each row of the field columns.
+    The literals are joined into a single printf-style format string,
+    so each row is rendered with one formatting call instead of concatenating its pieces.
+
+    Args:
+        parts (Sequence[str]): Template parts, with field names at odd positions.
+        columns (List[Sequence[Any]]): Values of each field, in the order of the fields in the template.
+
+    Returns:
+        List[str]: Rendered template for each row.
+    """
+    format_string = '%s'.join(literal.replace('%', '%%') for literal in parts[::2])
+    return [format_string % values for values in zip(*columns)]
+
 
 class BaseSkill(BaseModel, ABC):
     """
@@ -29,6 +73,10 @@ class BaseSkill(BaseModel, ABC):
         output_template (str): Template for the output data.
         input_data_field (str): Name of the input data field.
         prediction_field (str): Name of the prediction field to be used for the output data.
+        rows_per_prompt (int): Number of input rows marshaled into a single LLM prompt.
+        cache_enabled (bool): Whether to reuse runtime predictions for identical prompts.
+                              The cache keeps the `_CACHE_MAX_SIZE` most recently used predictions,
+                              use `clear_cache()` to release it.
     """
     name: str = Field(
         title='Skill name',
@@ -78,6 +126,34 @@ class BaseSkill(BaseModel, ABC):
         examples=['predictions'],
         default='predictions'
     )
+    rows_per_prompt: int = Field(
+        title='Rows per prompt',
+        description='Number of input rows marshaled into a single LLM prompt. '
+                    'When greater than 1, the LLM is asked to return a JSON array with one prediction per row, '
+                    'which reduces the number of requests. Only applies to output templates that generate '
+                    '`prediction_field` alone with `gen`, other templates are processed row by row.',
+        examples=[1, 10],
+        default=1,
+        ge=1
+    )
+    cache_enabled: bool = Field(
+        title='Cache enabled',
+        description='Whether to cache runtime predictions in memory and reuse them for identical prompts. '
+                    'Most useful with deterministic runtimes (e.g. temperature=0) and duplicated inputs. '
+                    'Least recently used predictions are evicted once the cache is full, '
+                    'call `clear_cache()` to release it explicitly.',
+        examples=[True],
+        default=False
+    )
+
+    _cache: Dict[bytes, Dict[str, Any]] = PrivateAttr(default_factory=OrderedDict)
+    _CACHE_MAX_SIZE: ClassVar[int] = 10000
+    _MARSHALED_MAX_TOKENS_PER_ROW: ClassVar[int] = 100
+
+    # TODO: more robust way to exclude system fields
+    _SYSTEM_FIELDS: ClassVar[FrozenSet[str]] = frozenset({
+        'name', 'description', 'input_template', 'output_template', 'instructions',
+        'input_data_field', 'prediction_field', 'rows_per_prompt', 'cache_enabled'})
 
     @model_validator(mode='after')
     def validate_inputs(self) -> 'BaseSkill':
@@ -96,7 +172,12 @@ class BaseSkill(BaseModel, ABC):
                             f'\nFor example, if your input data stored in `"text"` column, '
                             f'you can set\n\nskill = {self.__class__.__name__}(..., input_data_field="text")')
                 raise ValueError(f'`input_data_field` is not provided for skill {self.name}')
-            self.input_template = self.input_template.format(input=self.input_data_field)
+            # equivalent to `input_template.format(input=input_data_field)` for well-formed templates:
+            # substitute the placeholder and unescape the remaining doubled braces, without the format parser
+            self.input_template = ('{{' + self.input_data_field + '}}').join(
+                part.replace('{{', '{').replace('}}', '}')
+                for part in self.input_template.split('{{{{{input}}}}}')
+            )
         return self
 
     def __call__(self, input: InternalDataFrame, runtime: Runtime, dataset: Dataset) -> InternalDataFrame:
@@ -115,18 +196,240 @@ class BaseSkill(BaseModel, ABC):
         """
 
         # get user defined dataset input fields
+        extra_fields = self._get_extra_fields()
+        if self.cache_enabled:
+            runtime_predictions = self._process_cached_batch(input, runtime, extra_fields)
+        else:
+            runtime_predictions = self._process_batch(input, runtime, extra_fields)
+        # shallow copy shares the input columns, only prediction columns are (re)placed in the output
+        output = input.copy(deep=False)
+        # runtime predictions are indexed as the input, so assign raw values to skip index alignment
+        for column in runtime_predictions.columns:
+            output[column] = runtime_predictions[column].to_numpy()
+        return output
+
+    def _process_batch(
+        self,
+        input: InternalDataFrame,
+        runtime: Runtime,
+        extra_fields: Dict[str, Any]
+    ) -> InternalDataFrame:
+        """
+        Gets runtime predictions for a batch of inputs.
 
-        runtime_predictions = runtime.process_batch(
+        Args:
+            input (InternalDataFrame): Input data in the form of an InternalDataFrame.
+            runtime (Runtime): The runtime instance to be used for processing.
+            extra_fields (Dict[str, Any]): Fields that are not system fields, passed to the templates.
+
+        Returns:
+            InternalDataFrame: Runtime predictions named after the skill, indexed as the input data.
+        """
+        if self.rows_per_prompt > 1 and self._supports_marshaling(runtime):
+            return self._process_marshaled_batch(input, runtime, extra_fields)
+        return runtime.process_batch(
             batch=input,
             input_template=self.input_template,
             output_template=self.output_template,
             instructions=self.instructions,
-            extra_fields=self._get_extra_fields()
+            extra_fields=extra_fields,
+            output_column_map={self.prediction_field: self.name}
         )
-        runtime_predictions.rename(columns={self.prediction_field: self.name}, inplace=True)
-        output = input.copy()
-        output[runtime_predictions.columns] = runtime_predictions[runtime_predictions.columns]
-        return output
+
+    def _process_cached_batch(
+        self,
+        input: InternalDataFrame,
+        runtime: Runtime,
+        extra_fields: Dict[str, Any]
+    ) -> InternalDataFrame:
+        """
+        Gets runtime predictions for a batch of inputs, reusing the predictions made for identical prompts.
+        Each row is keyed by a hash of the skill templates, extra fields, runtime settings and row values,
+        and only rows with unseen keys are sent to the runtime.
+
+        Args:
+            input (InternalDataFrame): Input data in the form of an InternalDataFrame.
+            runtime (Runtime): The runtime instance to be used for processing.
+            extra_fields (Dict[str, Any]): Fields that are not system fields, passed to the templates.
+
+        Returns:
+            InternalDataFrame: Runtime predictions named after the skill, indexed as the input data.
+        """
+        prompt_hash = hashlib.blake2b(digest_size=16)
+        prompt_hash.update(json.dumps([
+            self.name, self.instructions, self.input_template, self.output_template,
+            self.prediction_field, self.rows_per_prompt, extra_fields,
+            # runtime settings that change predictions, secrets are not part of the key
+            runtime.__class__.__name__,
+            {k: v for k, v in getattr(runtime, 'llm_params', {}).items() if k != 'api_key'}
+        ], sort_keys=True, default=str).encode())
+
+        columns = input.columns.tolist()
+        keys = []
+        for row in zip(*(input[column].to_numpy() for column in columns)):
+            row_hash = prompt_hash.copy()
+            row_hash.update(json.dumps(dict(zip(columns, row)), sort_keys=True, default=str).encode())
+            keys.append(row_hash.digest())
+
+        # private attributes are resolved through pydantic's __getattr__, so bind the cache once
+        cache = self._cache
+        predictions = {}
+        # positions of the first occurrence of each key that is not cached yet
+        uncached = {}
+        for position, key in enumerate(keys):
+            if key in predictions or key in uncached:
+                continue
+            # pop and reinsert to mark the prediction as recently used
+            prediction = cache.pop(key, None)
+            if prediction is None:
+                uncached[key] = position
+            else:
+                predictions[key] = cache[key] = prediction
+
+        if uncached:
+            new_predictions = self._process_batch(input.iloc[list(uncached.values())], runtime, extra_fields)
+            new_predictions = dict(zip(uncached, new_predictions.to_dict(orient='records')))
+            cache.update(new_predictions)
+            predictions.update(new_predictions)
+        while len(cache) > self._CACHE_MAX_SIZE:
+            cache.popitem(last=False)
+
+        return InternalDataFrame([predictions[key] for key in keys], index=input.index)
+
+    def clear_cache(self):
+        """
+        Drops the runtime predictions cached when `cache_enabled` is set.
+        """
+        self._cache.clear()
+
+    def _supports_marshaling(self, runtime: Runtime) -> bool:
+        """
+        Checks whether rows can be marshaled into a single prompt: the marshaled prompt only generates
+        a free-form `prediction_field`, so output templates with other outputs or with constrained
+        generation (e.g. `select` over labels) are processed row by row instead.
+
+        Args:
+            runtime (Runtime): The runtime instance to be used for processing.
+
+        Returns:
+            bool: True if `rows_per_prompt` can be applied.
+        """
+        return (
+            isinstance(runtime, LLMRuntime)
+            and runtime.get_outputs(self.output_template) == [self.prediction_field]
+            and not _TEMPLATE_SELECT_RE.search(self.output_template)
+        )
+
+    def _process_marshaled_batch(
+        self,
+        input: InternalDataFrame,
+        runtime: Runtime,
+        extra_fields: Dict[str, Any]
+    ) -> InternalDataFrame:
+        """
+        Processes a batch by concatenating `rows_per_prompt` rendered input rows into a single numbered prompt.
+        The LLM is asked to return a JSON array of predictions, which is exploded back into the original rows.
+        Chunks whose response can't be parsed fall back to the regular row-by-row processing.
+
+        Args:
+            input (InternalDataFrame): Input data in the form of an InternalDataFrame.
+            runtime (Runtime): The runtime instance to be used for processing.
+            extra_fields (Dict[str, Any]): Fields that are not system fields, passed to the templates.
+
+        Returns:
+            InternalDataFrame: Runtime predictions named after the skill, indexed as the input data.
+        """
+        # render input template for each row, no LLM calls are made at this stage
+        rendered_inputs = self._render_inputs(input, runtime, extra_fields)
+
+        predictions = []
+        for start in range(0, len(input), self.rows_per_prompt):
+            chunk = input.iloc[start:start + self.rows_per_prompt]
+            chunk_inputs = rendered_inputs.iloc[start:start + self.rows_per_prompt]
+            result = runtime.process_record(
+                record={
+                    'marshaled_inputs': '\n'.join(
+                        f'{i}. {text}' for i, text in enumerate(chunk_inputs, start=1))
+                },
+                instructions=f'{self.instructions}\n\n'
+                             f'You are given {len(chunk)} numbered inputs. '
+                             f'Process each input independently and respond only with a JSON array '
+                             f'of exactly {len(chunk)} outputs, in the same order as the inputs.',
+                input_template='{{marshaled_inputs}}',
+                # the response holds one output per row, so scale the generation budget with the chunk
+                output_template=f"Output: {{{{gen '{self.prediction_field}' "
+                                f"max_tokens={len(chunk) * self._MARSHALED_MAX_TOKENS_PER_ROW}}}}}",
+                extra_fields=extra_fields
+            )
+            outputs = self._parse_marshaled_outputs(result[self.prediction_field], len(chunk))
+            if outputs is None:
+                # fall back to single row prompts
+                predictions.append(runtime.process_batch(
+                    batch=chunk,
+                    input_template=self.input_template,
+                    output_template=self.output_template,
+                    instructions=self.instructions,
+                    extra_fields=extra_fields,
+                    output_column_map={self.prediction_field: self.name}
+                ))
+            else:
+                predictions.append(InternalDataFrame({self.name: outputs}, index=chunk.index))
+
+        return InternalDataFrameConcat(predictions)
+
+    @staticmethod
+    def _parse_marshaled_outputs(text: str, size: int) -> Optional[List[Any]]:
+        """
+        Parses the JSON array returned by the LLM for a marshaled prompt.
+
+        Args:
+            text (str): LLM response.
+            size (int): Expected number of outputs.
+
+        Returns:
+            Optional[List[Any]]: List of outputs, or None if the response is not a JSON array of the expected size.
+        """
+        try:
+            outputs = json.loads(text[text.find('['):text.rfind(']') + 1])
+        except (json.JSONDecodeError, TypeError):
+            return None
+        if not isinstance(outputs, list) or len(outputs) != size:
+            return None
+        return outputs
+
+    def _render_inputs(
+        self,
+        input: InternalDataFrame,
+        runtime: Runtime,
+        extra_fields: Dict[str, Any]
+    ) -> InternalSeries:
+        """
+        Renders the input template for each row of the input data.
+        Templates with plain field substitutions of input columns are rendered in Python,
+        others are rendered by the runtime template engine.
+
+        Args:
+            input (InternalDataFrame): Input data in the form of an InternalDataFrame.
+            runtime (Runtime): The runtime instance used to render the template.
+            extra_fields (Dict[str, Any]): Fields that are not system fields, passed to the template.
+
+        Returns:
+            InternalSeries: Rendered inputs, indexed as the input data.
+        """
+        parts = _split_template(self.input_template)
+        if parts is None or not set(parts[1::2]).issubset(input.columns):
+            return runtime.process_batch(
+                batch=input,
+                input_template=self.input_template,
+                extra_fields=extra_fields
+            ).iloc[:, 0]
+
+        fields = parts[1::2]
+        if not fields:
+            return InternalSeries([parts[0]] * len(input), index=input.index, dtype=object)
+        # tolist() keeps pandas scalars (e.g. Timestamp), so values render as in the runtime templates
+        rendered = _render_template_batch(parts, [input[field].tolist() for field in fields])
+        return InternalSeries(rendered, index=input.index, dtype=object)
 
     def _get_extra_fields(self):
         """
@@ -136,12 +439,7 @@ class BaseSkill(BaseModel, ABC):
             dict: A dictionary containing fields that are not system fields.
         """
         
-        # TODO: more robust way to exclude system fields
-        system_fields = {
-            'name', 'description', 'input_template', 'output_template', 'instructions',
-            'input_data_field', 'prediction_field'}
-        extra_fields = self.model_dump(exclude=system_fields)
-        return extra_fields
+        return self.model_dump(exclude=self._SYSTEM_FIELDS)
 
     @abstractmethod
     def apply(
@@ -249,19 +547,58 @@ class LLMSkill(BaseSkill):
             predictions (InternalDataFrame): The predictions made by the skill.
         """
 
-        predictions = []
         if isinstance(dataset, InternalDataFrame):
             dataset = DataFrameDataset(df=dataset)
 
-        for batch in dataset.batch_iterator():
-            runtime_predictions = self(batch, runtime, dataset)
-            predictions.append(runtime_predictions)
-
+        predictions = list(self.iter_apply(dataset, runtime))
         if predictions:
-            return InternalDataFrameConcat(predictions, copy=False)
+            return InternalDataFrameConcat(predictions, copy=False, sort=False)
 
         return InternalDataFrame(columns=dataset.df.columns.tolist() + [self.name])
 
+    def iter_apply(
+        self,
+        dataset: Union[Dataset, InternalDataFrame],
+        runtime: LLMRuntime,
+    ) -> Iterator[InternalDataFrame]:
+        """
+        Applies the LLM skill on a dataset batch by batch, yielding the predictions for each batch
+        as soon as it is processed, so that the whole result doesn't have to be held in memory.
+        If `runtime.max_parallel` is greater than 1, up to that many batches are processed concurrently
+        in a thread pool, since runtime calls are blocking.
+
+        Args:
+            dataset (Union[Dataset, InternalDataFrame]): The dataset on which the skill is to be applied.
+            runtime (LLMRuntime): The runtime instance to be used for processing.
+
+        Yields:
+            InternalDataFrame: The predictions made by the skill for each batch, in the dataset order.
+        """
+
+        if isinstance(dataset, InternalDataFrame):
+            dataset = DataFrameDataset(df=dataset)
+
+        if runtime.max_parallel <= 1:
+            for batch in dataset.batch_iterator():
+                yield self(batch, runtime, dataset)
+            return
+
+        # keep up to max_parallel batches in flight, submitting the next one
+        # as soon as the oldest is yielded, so that results stay in the dataset order
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=runtime.max_parallel) as executor:
+            try:
+                for batch in dataset.batch_iterator():
+                    if len(pending) >= runtime.max_parallel:
+                        yield pending.popleft().result()
+                    pending.append(executor.submit(self, batch, runtime, dataset))
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                # don't process the remaining batches if the iteration stops early
+                for future in pending:
+                    future.cancel()
+
     def analyze(
         self,
         predictions: InternalDataFrame,
@@ -287,63 +624,95 @@ class LLMSkill(BaseSkill):
         # collect errors and create error report
         # first sample errors - make it uniform, but more sophisticated sampling can be implemented
         MAX_ERRORS = 3
-        errors = errors.sample(n=min(MAX_ERRORS, errors.shape[0]))
+        # sample positions with the global numpy RNG, so that np.random.seed() makes the analysis reproducible
+        errors = errors.iloc[np.random.choice(errors.shape[0], size=min(MAX_ERRORS, errors.shape[0]), replace=False)]
         # TODO: ground truth column name can be the input parameter that comes from GT signal
         ground_truth_column_name = errors.columns[-1]
         extra_fields = self._get_extra_fields()
 
         # get error prepared inputs
-        inputs = student_runtime.process_batch(
-            batch=predictions.loc[errors.index],
-            input_template=self.input_template,
-            extra_fields=extra_fields
-        )
+        inputs = self._render_inputs(predictions.loc[errors.index], student_runtime, extra_fields)
 
         if not teacher_runtime:
             teacher_runtime = student_runtime
 
-        predictions_and_errors = pd.concat([
-            inputs,
-            predictions[self.name].loc[errors.index],
-            errors[ground_truth_column_name]
-        ], axis=1)
-        predictions_and_errors.columns = ['input', 'prediction', 'ground_truth']
+        # inputs and errors share the same index, so the frame is built without realignment
+        predictions_and_errors = InternalDataFrame({
+            'input': inputs.to_numpy(),
+            'prediction': predictions.loc[errors.index, self.name].to_numpy(),
+            'ground_truth': errors[ground_truth_column_name].to_numpy()
+        }, index=errors.index)
         # TODO: move handlebars to Runtime level and abstract template language for skill
         # For example, using f-string format as generic, that translates to handlebars inside GuidanceRuntime
-        error_reasons = teacher_runtime.process_batch(
-            batch=predictions_and_errors,
+        # marshal all errors into a single prompt to get the reasons in one LLM call
+        result = teacher_runtime.process_record(
+            record={
+                'predictions_and_errors': [
+                    {'input': input, 'prediction': prediction, 'ground_truth': ground_truth}
+                    for input, prediction, ground_truth in zip(
+                        predictions_and_errors['input'].to_numpy(),
+                        predictions_and_errors['prediction'].to_numpy(),
+                        predictions_and_errors['ground_truth'].to_numpy()
+                    )
+                ],
+            },
             instructions="{{#system~}}\n"
                          "LLM prompt was created by concatenating instructions with text input:\n\n"
                          "Prediction = LLM(Input, Instructions)\n\n"
                          "We expect the prediction to be equal to the ground truth.\n"
-                         "Your task is to provide a reason for the error due to the original instruction.\n"
-                         "Be concise and specific.\n\n"
+                         "Your task is to provide a reason for each error due to the original instruction.\n"
+                         "Be concise and specific.\n"
+                         "Respond only with a JSON array of strings containing one reason per error, "
+                         "in the same order as the errors.\n\n"
                          f"Instructions: {self.instructions}\n"
                          "{{~/system}}",
             input_template="{{#user~}}\n"
-                           "{{input}}\n"
-                           "Prediction: {{prediction}}\n"
-                           "Ground truth: {{ground_truth}}\n"
-                           "Error reason:\n"
-                           "{{~/user}}",
-            output_template="{{#assistant~}}{{gen 'reason'}}{{~/assistant}}",
-            extra_fields=extra_fields
-        )
-        predictions_and_errors['reason'] = error_reasons['reason']
-        # build error report
-        result = teacher_runtime.process_record(
-            record={
-                'predictions_and_errors': predictions_and_errors.to_dict(orient='records'),
-            },
-            input_template="{{#each predictions_and_errors}}"
+                           "{{#each predictions_and_errors}}"
                            "\n{{this.input}}\n"
                            "Prediction: {{this.prediction}}\n"
                            "Ground truth: {{this.ground_truth}}\n"
-                           'Error reason: {{this.reason}}\n'
                            "{{/each}}"
+                           "\nError reasons:\n"
+                           "{{~/user}}",
+            output_template="{{#assistant~}}{{gen 'reasons'}}{{~/assistant}}",
+            extra_fields=extra_fields
+        )
+        error_reasons = self._parse_marshaled_outputs(result['reasons'], len(predictions_and_errors))
+        if error_reasons is None:
+            # fall back to one LLM call per error
+            error_reasons = teacher_runtime.process_batch(
+                batch=predictions_and_errors,
+                instructions="{{#system~}}\n"
+                             "LLM prompt was created by concatenating instructions with text input:\n\n"
+                             "Prediction = LLM(Input, Instructions)\n\n"
+                             "We expect the prediction to be equal to the ground truth.\n"
+                             "Your task is to provide a reason for the error due to the original instruction.\n"
+                             "Be concise and specific.\n\n"
+                             f"Instructions: {self.instructions}\n"
+                             "{{~/system}}",
+                input_template="{{#user~}}\n"
+                               "{{input}}\n"
+                               "Prediction: {{prediction}}\n"
+                               "Ground truth: {{ground_truth}}\n"
+                               "Error reason:\n"
+                               "{{~/user}}",
+                output_template="{{#assistant~}}{{gen 'reason'}}{{~/assistant}}",
+                extra_fields=extra_fields
+            )['reason'].to_numpy()
+        predictions_and_errors['reason'] = error_reasons
+        # build error report, no generation is needed so it is formatted without LLM
+        error_report = ''.join(
+            f"\n{input}\n"
+            f"Prediction: {prediction}\n"
+            f"Ground truth: {ground_truth}\n"
+            f"Error reason: {reason}\n"
+            for input, prediction, ground_truth, reason in zip(
+                predictions_and_errors['input'].to_numpy(),
+                predictions_and_errors['prediction'].to_numpy(),
+                predictions_and_errors['ground_truth'].to_numpy(),
+                predictions_and_errors['reason'].to_numpy()
+            )
         )
-        # no specific output specified, all output is in the error report
-        error_report = result['']
         return error_report
 
     def improve(
@@ -2,7 +2,7 @@ from pydantic import BaseModel, model_validator, field_validator
 from abc import ABC, abstractmethod
 from typing import List, Union, Dict, Any, Optional, Mapping
 from collections import OrderedDict
-from adala.datasets.base import Dataset
+from adala.datasets import Dataset, DataFrameDataset
 from adala.runtimes.base import Runtime
 from adala.utils.logs import print_text
 from adala.utils.internal_data import InternalDataFrame, InternalSeries, InternalDataFrameConcat
@@ -199,11 +199,7 @@ class LinearSkillSet(SkillSet):
         """
 
         predictions = None
-        if improved_skill:
-            # start from the specified skill, assuming previous skills have already been applied
-            skill_sequence = self.skill_sequence[self.skill_sequence.index(improved_skill):]
-        else:
-            skill_sequence = self.skill_sequence
+        skill_sequence = self._get_skill_sequence(improved_skill)
         for i, skill_name in enumerate(skill_sequence):
             skill = self.skills[skill_name]
             # use input dataset for the first node in the pipeline
@@ -213,6 +209,56 @@ class LinearSkillSet(SkillSet):
         
         return predictions
 
+    def apply_fused(
+        self,
+        dataset: Union[Dataset, InternalDataFrame],
+        runtime: Runtime,
+        improved_skill: Optional[str] = None,
+    ) -> InternalDataFrame:
+        """
+        Applies the whole sequence of skills in a single pass over the dataset:
+        each batch goes through all the skills before the next batch is read,
+        instead of iterating over the full dataset once per skill.
+
+        Args:
+            dataset (Dataset): The dataset to apply the skills on.
+            runtime (Runtime): The runtime environment in which to apply the skills.
+            improved_skill (Optional[str], optional): Name of the skill to improve. Defaults to None.
+        Returns:
+            InternalDataFrame: Skill predictions.
+        """
+
+        if isinstance(dataset, InternalDataFrame):
+            dataset = DataFrameDataset(df=dataset)
+
+        skill_sequence = self._get_skill_sequence(improved_skill)
+        print_text(f"Applying skills: {', '.join(skill_sequence)}")
+        predictions = []
+        for batch in dataset.batch_iterator():
+            for skill_name in skill_sequence:
+                batch = self.skills[skill_name](batch, runtime, dataset)
+            predictions.append(batch)
+
+        if predictions:
+            return InternalDataFrameConcat(predictions, copy=False, sort=False)
+
+        columns = dataset.df.columns.tolist()
+        return InternalDataFrame(columns=columns + [name for name in skill_sequence if name not in columns])
+
+    def _get_skill_sequence(self, improved_skill: Optional[str] = None) -> List[str]:
+        """
+        Returns the sequence of skill names to apply.
+
+        Args:
+            improved_skill (Optional[str], optional): Name of the skill to start from. Defaults to None.
+        Returns:
+            List[str]: Skill names in the order of application.
+        """
+        if improved_skill:
+            # start from the specified skill, assuming previous skills have already been applied
+            return self.skill_sequence[self.skill_sequence.index(improved_skill):]
+        return self.skill_sequence
+
     def select_skill_to_improve(
         self,
         accuracy: Mapping,
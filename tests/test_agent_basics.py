@@ -19,51 +19,32 @@ from utils import patching, PatchedCalls
         {'input': {'input': '0 5 0'}, 'output': {'predictions': '1 5 1'}},
         # call[1]: apply first skill 0->1, second row, GT = 1 1 1 -> ERROR!
         {'input': {'input': '0 0 0'}, 'output': {'predictions': '1 5 1'}},
-        # call[2]: prepare error inputs for first skill 0->1, second row
-        {'input': {'input': '0 0 0', '0->1': '1 5 1'}, 'output': 'Input: 0 0 0'},
-        # call[3]: analyze errors first skill 0->1
-        {
-            'input': {
-                'input': 'Input: 0 0 0',
-                'prediction': '1 5 1',
-                'ground_truth': '1 1 1'
-            },
-            'output': {
-                'reason': '0 transformed to 5 instead of 1'
-            }
-        },
-        # call[4]: build error report for first skill 0->1
+        # call[2]: analyze errors first skill 0->1
         {
             'input': {
                 'predictions_and_errors': [{
                     'input': 'Input: 0 0 0',
                     'prediction': '1 5 1',
-                    'ground_truth': '1 1 1',
-                    'reason': '0 transformed to 5 instead of 1'
+                    'ground_truth': '1 1 1'
                 }]},
-            'output': '''\
-                Input: 0 0 0
-                Prediction: 1 5 1
-                Ground Truth: 1 1 1
-                Error reason: 0 transformed to 5 instead of 1
-            ''',
+            'output': {
+                'reasons': '["0 transformed to 5 instead of 1"]'
+            }
         },
-        # call[5]: improve first skill 0->1
+        # call[3]: improve first skill 0->1
         {
             'input': {
-                'error_analysis': '''\
-                Input: 0 0 0
-                Prediction: 1 5 1
-                Ground Truth: 1 1 1
-                Error reason: 0 transformed to 5 instead of 1
-            '''},
+                'error_analysis': '\nInput: 0 0 0\n'
+                                  'Prediction: 1 5 1\n'
+                                  'Ground truth: 1 1 1\n'
+                                  'Error reason: 0 transformed to 5 instead of 1\n'},
             'output': {
                 'new_instruction': 'Transform 0 to 1'
             }
         },
-        # call[6]: reapply skill 0->1, first row
+        # call[4]: reapply skill 0->1, first row
         {'input': {'input': '0 5 0'}, 'output': {'predictions': '1 5 1'}},
-        # call[7]: reapply skill 0->1, first row
+        # call[5]: reapply skill 0->1, first row
         {'input': {'input': '0 0 0'}, 'output': {'predictions': '1 1 1'}},
 
     ]
@@ -119,101 +100,65 @@ def test_agent_quickstart_single_skill():
         {'input': {'input': '0 5 0', '0->1': '1 5 1'}, 'output': {'predictions': '2 5 2'}},
         # call[3]: apply second skill 1->2, second row, GT = 2 2 2 -> ERROR
         {'input': {'input': '0 0 0', '0->1': '1 5 1'}, 'output': {'predictions': '2 5 2'}},
-        # call[4]: prepare error inputs for first skill 0->1, second row
-        {'input': {'input': '0 0 0', '0->1': '1 5 1'}, 'output': 'Input: 0 0 0'},
-        # call[5]: analyze errors first skill 0->1, error in the second row (0 0 0 -> 1 5 1)
-        {
-            'input': {
-                'input': 'Input: 0 0 0',
-                'prediction': '1 5 1',
-                'ground_truth': '1 1 1'
-            },
-            'output': {
-                'reason': '0 transformed to 5 instead of 1'
-            }
-        },
-        # call[6]: build error report for first skill 0->1
+        # call[4]: analyze errors first skill 0->1, error in the second row (0 0 0 -> 1 5 1)
         {
             'input': {
                 'predictions_and_errors': [{
                     'input': 'Input: 0 0 0',
                     'prediction': '1 5 1',
-                    'ground_truth': '1 1 1',
-                    'reason': '0 transformed to 5 instead of 1'
+                    'ground_truth': '1 1 1'
                 }]},
-            'output': '''\
-                Input: 0 0 0
-                Prediction: 1 5 1
-                Ground Truth: 1 1 1
-                Error reason: 0 transformed to 5 instead of 1
-            ''',
+            'output': {
+                'reasons': '["0 transformed to 5 instead of 1"]'
+            }
         },
-        # call[7]: improve first skill 0->1
+        # call[5]: improve first skill 0->1
         {
             'input': {
-                'error_analysis': '''\
-                Input: 0 0 0
-                Prediction: 1 5 1
-                Ground Truth: 1 1 1
-                Error reason: 0 transformed to 5 instead of 1
-            '''},
+                'error_analysis': '\nInput: 0 0 0\n'
+                                  'Prediction: 1 5 1\n'
+                                  'Ground truth: 1 1 1\n'
+                                  'Error reason: 0 transformed to 5 instead of 1\n'},
             'output': {
                 'new_instruction': 'Transform 0 to 1'
             }
         },
-        # call[8]: reapply first skill 0->1, first row, GT = 1 5 1
+        # call[6]: reapply first skill 0->1, first row, GT = 1 5 1
         {'input': {'input': '0 5 0'}, 'output': {'predictions': '1 5 1'}},
-        # call[9]: reapply first skill 0->1, second row, GT = 1 1 1
+        # call[7]: reapply first skill 0->1, second row, GT = 1 1 1
         {'input': {'input': '0 0 0'}, 'output': {'predictions': '1 1 1'}},
-        # call[10]: reapply second skill 1->2, first row, GT = 2 5 2 -> ERROR!
+        # call[8]: reapply second skill 1->2, first row, GT = 2 5 2 -> ERROR!
         {'input': {'input': '0 5 0', '0->1': '1 5 1'}, 'output': {'predictions': '2 2 2'}},
-        # call[11]: reapply second skill 1->2, second row, GT = 2 2 2
+        # call[9]: reapply second skill 1->2, second row, GT = 2 2 2
         {'input': {'input': '0 0 0', '0->1': '1 1 1'}, 'output': {'predictions': '2 2 2'}},
-        # call[12]: prepare error inputs for second skill 1->2, first row
+        # call[10]: prepare error inputs for second skill 1->2, first row
         {'input': {'input': '0 5 0', '0->1': '1 5 1'}, 'output': 'Input: 1 5 1'},
-        # call[13]: analyze errors second skill 1->2 (first row 2 2 2 instead of 2 5 2)
-        {
-            'input': {
-                'input': 'Input: 1 5 1',
-                'prediction': '2 2 2',
-                'ground_truth': '2 5 2',
-            },
-            'output': {
-                'reason': '5 transformed to 2 instead of remaining 5'
-            }
-        },
-        # call[14]: build error report for second skill 1->2
+        # call[11]: analyze errors second skill 1->2 (first row 2 2 2 instead of 2 5 2)
         {
             'input': {
                 'predictions_and_errors': [{
                     'input': 'Input: 1 5 1',
                     'prediction': '2 2 2',
-                    'ground_truth': '2 5 2',
-                    'reason': '5 transformed to 2 instead of remaining 5'
+                    'ground_truth': '2 5 2'
                 }]},
-            'output': '''\
-                Input: 1 5 1
-                Prediction: 2 2 2
-                Ground Truth: 2 5 2
-                Error reason: 5 transformed to 2 instead of remaining 5
-            ''',
+            'output': {
+                'reasons': '["5 transformed to 2 instead of remaining 5"]'
+            }
         },
-        # call[15]: improve second skill 1->2
+        # call[12]: improve second skill 1->2
         {
             'input': {
-                'error_analysis': '''\
-                Input: 1 5 1
-                Prediction: 2 2 2
-                Ground Truth: 2 5 2
-                Error reason: 5 transformed to 2 instead of remaining 5
-            '''},
+                'error_analysis': '\nInput: 1 5 1\n'
+                                  'Prediction: 2 2 2\n'
+                                  'Ground truth: 2 5 2\n'
+                                  'Error reason: 5 transformed to 2 instead of remaining 5\n'},
             'output': {
                 'new_instruction': 'Transform 1 to 2'
             }
         },
-        # call[16]: reapply second skill 1->2, first row, GT = 2 5 2
+        # call[13]: reapply second skill 1->2, first row, GT = 2 5 2
         {'input': {'input': '0 5 0', '0->1': '1 5 1'}, 'output': {'predictions': '2 5 2'}},
-        # call[17]: reapply second skill 1->2, second row, GT = 2 2 2
+        # call[14]: reapply second skill 1->2, second row, GT = 2 2 2
         {'input': {'input': '0 0 0', '0->1': '1 1 1'}, 'output': {'predictions': '2 2 2'}},
     ]
 )
@@ -269,53 +214,36 @@ def test_agent_quickstart_two_skills():
         {'input': {'input': '0 5 0'}, 'output': {'predictions': '1 5 1'}},
         # call[1]: apply second skill 1->2, GT = 2 5 2 -> ERROR!
         {'input': {'input': '0 5 0', '0->1': '1 5 1'}, 'output': {'predictions': '2 5 4'}},
-        # call[3]: apply third skill 2->3, GT = 3 5 3 -> Also error, but it is due to previous error
+        # call[2]: apply third skill 2->3, GT = 3 5 3 -> Also error, but it is due to previous error
         {'input': {'input': '0 5 0', '0->1': '1 5 1', '1->2': '2 5 4'}, 'output': {'predictions': '3 5 4'}},
-        # call[4]: prepare error input for second skill 1->2 (2 5 4 instead of 2 5 2)
+        # call[3]: prepare error input for second skill 1->2 (2 5 4 instead of 2 5 2)
         {'input': {'input': '0 5 0', '0->1': '1 5 1', '1->2': '2 5 4', '2->3': '3 5 4'}, 'output': 'Input: 1 5 1'},
-        # call[5]: analyze errors for second skill 1->2 (2 5 4 instead of 2 5 2)
-        {
-            'input': {
-                'input': 'Input: 1 5 1',
-                'prediction': '2 5 4',
-                'ground_truth': '2 5 2',
-            },
-            'output': {
-                'reason': '1 transformed to 4 instead of 2'
-            }
-        },
-        # call[6]: build error report for second skill 1->2
+        # call[4]: analyze errors for second skill 1->2 (2 5 4 instead of 2 5 2)
         {
             'input': {
                 'predictions_and_errors': [{
                     'input': 'Input: 1 5 1',
                     'prediction': '2 5 4',
-                    'ground_truth': '2 5 2',
-                    'reason': '1 transformed to 4 instead of 2'
+                    'ground_truth': '2 5 2'
                 }]},
-            'output': '''\
-                Input: 1 5 1
-                Prediction: 2 5 4
-                Ground Truth: 2 5 2
-                Error reason: 1 transformed to 4 instead of 2
-            ''',
+            'output': {
+                'reasons': '["1 transformed to 4 instead of 2"]'
+            }
         },
-        # call[7]: improve first skill 0->1
+        # call[5]: improve first skill 0->1
         {
             'input': {
-                'error_analysis': '''\
-                Input: 1 5 1
-                Prediction: 2 5 4
-                Ground Truth: 2 5 2
-                Error reason: 1 transformed to 4 instead of 2
-            '''},
+                'error_analysis': '\nInput: 1 5 1\n'
+                                  'Prediction: 2 5 4\n'
+                                  'Ground truth: 2 5 2\n'
+                                  'Error reason: 1 transformed to 4 instead of 2\n'},
             'output': {
                 'new_instruction': 'Transform 1 to 2'
             }
         },
-        # call[8]: apply second skill 1->2, GT = 2 5 2
+        # call[6]: apply second skill 1->2, GT = 2 5 2
         {'input': {'input': '0 5 0', '0->1': '1 5 1'}, 'output': {'predictions': '2 5 2'}},
-        # call[9]: apply third skill 2->3, GT = 3 5 3
+        # call[7]: apply third skill 2->3, GT = 3 5 3
         {'input': {'input': '0 5 0', '0->1': '1 5 1', '1->2': '2 5 2'}, 'output': {'predictions': '3 5 3'}},
     ]
 )
@@ -19,11 +19,7 @@ def process_record_generator(*args, **kwargs):
 
         # errors
         if i < 2:
-            yield {'reason': 'Test reason'}
-            yield {'reason': 'Test reason'}
-            yield {'reason': 'Test reason'}
-            yield {'reason': 'Test reason'}
-            yield {'': 'Test reason'}
+            yield {'reasons': '["Test reason", "Test reason"]'}
 
             # instruction generation
             yield {'new_instruction': 'Test instruction'}
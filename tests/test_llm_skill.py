@@ -0,0 +1,202 @@
+import warnings
+import pandas as pd
+from unittest.mock import patch
+from adala.runtimes.openai import OpenAIRuntime
+from utils import patching, PatchedCalls
+
+
+def uppercase_program(**kwargs):
+    return {'predictions': kwargs['text_'].upper()}
+
+
+@patching(
+    target_function=PatchedCalls.OPENAI_MODEL_LIST.value,
+    data=[{'input': {}, 'output': {'data': [{'id': 'gpt-3.5-turbo-instruct'}]}}],
+)
+def test_llm_skill_apply_parallel():
+    from adala.skills import LLMSkill
+
+    # 3 batches with the default batch size of 100
+    df = pd.DataFrame({'text': [f'text {i}' for i in range(250)]})
+    skill = LLMSkill(name='upper', instructions='Uppercase the text', input_data_field='text')
+    runtime = OpenAIRuntime(max_parallel=3)
+    # batches are processed concurrently, so the program output is derived from its input instead of the call order
+    with patch(PatchedCalls.GUIDANCE.value, side_effect=uppercase_program) as program_call:
+        predictions = skill.apply(df, runtime=runtime)
+
+    assert program_call.call_count == 250
+    pd.testing.assert_frame_equal(predictions, df.assign(upper=df['text'].str.upper()))
+
+
+@patching(
+    target_function=PatchedCalls.OPENAI_MODEL_LIST.value,
+    data=[{'input': {}, 'output': {'data': [{'id': 'gpt-3.5-turbo-instruct'}]}}],
+)
+@patching(
+    target_function=PatchedCalls.GUIDANCE.value,
+    data=[
+        # call[0]: rows 10, 11 marshaled into a single prompt
+        {
+            'input': {'marshaled_inputs': '1. Input: text 0\n2. Input: text 1'},
+            'output': {'predictions': '```json\n["TEXT 0", "TEXT 1"]\n```'}
+        },
+        # call[1]: rows 12, 13 marshaled into a single prompt
+        {
+            'input': {'marshaled_inputs': '1. Input: text 2\n2. Input: text 3'},
+            'output': {'predictions': '["TEXT 2", "TEXT 3"]'}
+        },
+        # call[2]: row 14, the response can't be parsed
+        {'input': {'marshaled_inputs': '1. Input: text 4'}, 'output': {'predictions': 'TEXT 4'}},
+        # call[3]: row 14, single row fallback
+        {'input': {'text_': 'text 4'}, 'output': {'predictions': 'TEXT 4'}},
+    ],
+)
+def test_llm_skill_rows_per_prompt():
+    from adala.skills import LLMSkill
+
+    df = pd.DataFrame({'text': [f'text {i}' for i in range(5)]}, index=[10, 11, 12, 13, 14])
+    skill = LLMSkill(name='upper', instructions='Uppercase the text', input_data_field='text', rows_per_prompt=2)
+    runtime = OpenAIRuntime()
+    predictions = skill.apply(df, runtime=runtime)
+
+    pd.testing.assert_frame_equal(predictions, df.assign(upper=df['text'].str.upper()))
+    # marshaled programs ask for one output per row, with a generation budget scaled by the chunk size
+    assert ('Uppercase the text\n\nYou are given 2 numbered inputs. '
+            'Process each input independently and respond only with a JSON array '
+            'of exactly 2 outputs, in the same order as the inputs.', None) in runtime._programs
+    assert ("Output: {{gen 'predictions' max_tokens=200}}", None) in runtime._programs
+    assert ("Output: {{gen 'predictions' max_tokens=100}}", None) in runtime._programs
+
+
+@patching(
+    target_function=PatchedCalls.OPENAI_MODEL_LIST.value,
+    data=[{'input': {}, 'output': {'data': [{'id': 'gpt-3.5-turbo-instruct'}]}}],
+)
+@patching(
+    target_function=PatchedCalls.GUIDANCE.value,
+    data=[
+        # select over labels can't be marshaled, rows are processed one by one with all the outputs
+        {
+            'input': {'text_': 'good', 'labels': ['positive', 'negative']},
+            'output': {'predictions': 'positive', 'score': {'positive': -0.1}}
+        },
+        {
+            'input': {'text_': 'bad', 'labels': ['positive', 'negative']},
+            'output': {'predictions': 'negative', 'score': {'negative': -0.1}}
+        },
+        {
+            'input': {'text_': 'good', 'labels': ['positive', 'negative']},
+            'output': {'predictions': 'positive', 'score': {'positive': -0.1}}
+        },
+    ],
+)
+def test_classification_skill_rows_per_prompt():
+    from adala.skills import ClassificationSkill
+
+    df = pd.DataFrame({'text': ['good', 'bad', 'good']})
+    skill = ClassificationSkill(
+        name='sentiment', labels=['positive', 'negative'], input_data_field='text', rows_per_prompt=2)
+    predictions = skill.apply(df, runtime=OpenAIRuntime())
+
+    pd.testing.assert_frame_equal(predictions, df.assign(
+        sentiment=['positive', 'negative', 'positive'],
+        score=[{'positive': -0.1}, {'negative': -0.1}, {'positive': -0.1}]
+    ))
+
+
+def test_extra_fields():
+    from adala.skills import ClassificationSkill
+
+    skill = ClassificationSkill(name='sentiment', labels=['positive', 'negative'], input_data_field='text')
+    assert skill._get_extra_fields() == {'labels': ['positive', 'negative']}
+
+    # system fields don't affect extra fields
+    skill.instructions = 'New instructions'
+    assert skill._get_extra_fields() == {'labels': ['positive', 'negative']}
+
+    skill.labels = ['positive', 'negative', 'neutral']
+    assert skill._get_extra_fields() == {'labels': ['positive', 'negative', 'neutral']}
+
+    skill.labels.append('mixed')
+    assert skill._get_extra_fields() == {'labels': ['positive', 'negative', 'neutral', 'mixed']}
+
+    copied = skill.model_copy(update={'labels': ['yes', 'no']})
+    assert copied._get_extra_fields() == {'labels': ['yes', 'no']}
+    assert skill._get_extra_fields() == {'labels': ['positive', 'negative', 'neutral', 'mixed']}
+
+
+@patching(
+    target_function=PatchedCalls.OPENAI_MODEL_LIST.value,
+    data=[{'input': {}, 'output': {'data': [{'id': 'gpt-3.5-turbo-instruct'}]}}],
+)
+@patch(PatchedCalls.GUIDANCE.value, side_effect=uppercase_program)
+def test_llm_skill_cache(program_call):
+    from adala.skills import LLMSkill
+
+    df = pd.DataFrame({'text': ['a', 'b', 'a', 'c', 'b']})
+    expected = df.assign(upper=df['text'].str.upper())
+    skill = LLMSkill(name='upper', instructions='Uppercase the text', input_data_field='text', cache_enabled=True)
+    runtime = OpenAIRuntime()
+
+    with warnings.catch_warnings():
+        # runtime settings are hashed without serialization warnings
+        warnings.simplefilter('error')
+        pd.testing.assert_frame_equal(skill.apply(df, runtime=runtime), expected)
+    assert program_call.call_count == 3
+
+    # all prompts are cached
+    pd.testing.assert_frame_equal(skill.apply(df, runtime=runtime), expected)
+    assert program_call.call_count == 3
+
+    # new instructions produce new prompts
+    skill.instructions = 'Uppercase the text, please'
+    pd.testing.assert_frame_equal(skill.apply(df, runtime=runtime), expected)
+    assert program_call.call_count == 6
+
+    skill.clear_cache()
+    pd.testing.assert_frame_equal(skill.apply(df, runtime=runtime), expected)
+    assert program_call.call_count == 9
+
+    # least recently used predictions are evicted
+    with patch.object(LLMSkill, '_CACHE_MAX_SIZE', 2):
+        pd.testing.assert_frame_equal(skill.apply(df, runtime=runtime), expected)
+        assert program_call.call_count == 9
+        assert len(skill._cache) == 2
+        pd.testing.assert_frame_equal(skill.apply(df.iloc[[1, 3]], runtime=runtime), expected.iloc[[1, 3]])
+        assert program_call.call_count == 9
+
+
+def test_render_inputs():
+    from adala.skills import LLMSkill
+
+    skill = LLMSkill(name='score', input_template='Text: {{{{{input}}}}} (100%), id={{{{id}}}}', input_data_field='text')
+    df = pd.DataFrame({'text': ['a', 'b %s'], 'id': [1, 2]}, index=[5, 7])
+    rendered = skill._render_inputs(df, runtime=None, extra_fields={})
+    pd.testing.assert_series_equal(rendered, pd.Series(['Text: a (100%), id=1', 'Text: b %s (100%), id=2'], index=[5, 7]))
+
+    # the split template is keyed on the template itself, so copies render their own template
+    copied = skill.model_copy(update={'input_template': 'Input: {{text}}'})
+    rendered = copied._render_inputs(df, runtime=None, extra_fields={})
+    pd.testing.assert_series_equal(rendered, pd.Series(['Input: a', 'Input: b %s'], index=[5, 7]))
+
+
+@patching(
+    target_function=PatchedCalls.OPENAI_MODEL_LIST.value,
+    data=[{'input': {}, 'output': {'data': [{'id': 'gpt-3.5-turbo-instruct'}]}}],
+)
+def test_render_inputs_matches_runtime():
+    from adala.skills import LLMSkill
+
+    skill = LLMSkill(
+        name='score', input_template='Text: {{{{{input}}}}}, date={{{{date}}}}, score={{{{score}}}}',
+        input_data_field='text')
+    df = pd.DataFrame({
+        'text': ['a', 'b'],
+        'date': pd.to_datetime(['2023-01-05', '2023-02-10']),
+        'score': [0.5, 1.0]
+    })
+    rendered = skill._render_inputs(df, runtime=None, extra_fields={})
+    # non-string columns are rendered as the runtime template engine renders them
+    expected = OpenAIRuntime().process_batch(batch=df, input_template=skill.input_template).iloc[:, 0]
+    pd.testing.assert_series_equal(rendered, expected, check_names=False)
+    assert rendered[0] == 'Text: a, date=2023-01-05 00:00:00, score=0.5'
@@ -72,3 +72,48 @@ def test_llm_linear_skillset():
         #  'skill_1': "\n- Le Musée du Louvre (Organisation)\n- Paris (Lieu)\n- La Joconde (Œuvre d'art)",
         #  'skill_2': '\n{\n    "Organisation": "Le Musée du Louvre",\n    "Lieu": "Paris",\n    "Œuvre d\'art": "La Joconde"\n}'}
     ]), predictions)
+
+
+def chained_calls(rows):
+    """Patched program calls for the skill_0 (uppercase) and skill_1 (reverse) pipeline, for the given rows."""
+    return [
+        {'input': {'text_': f'text {i}'}, 'output': {'predictions': f'TEXT {i}'}} for i in rows
+    ] + [
+        {'input': {'skill_0': f'TEXT {i}'}, 'output': {'predictions': f'TEXT {i}'[::-1]}} for i in rows
+    ]
+
+
+@patching(
+    target_function=PatchedCalls.OPENAI_MODEL_LIST.value,
+    data=[{'input': {}, 'output': {'data': [{'id': 'gpt-3.5-turbo-instruct'}]}}],
+)
+@patching(
+    target_function=PatchedCalls.GUIDANCE.value,
+    data=(
+        # apply_fused: each batch goes through both skills before the next batch is processed
+        chained_calls(range(100)) + chained_calls(range(100, 150))
+        # apply: each skill goes through the whole dataset
+        + chained_calls(range(150))
+    ),
+)
+def test_llm_linear_skillset_apply_fused():
+    from adala.skills.skillset import LinearSkillSet, LLMSkill
+    from adala.runtimes import OpenAIRuntime
+
+    skillset = LinearSkillSet(
+        skills=[
+            LLMSkill(name="skill_0", instructions="Uppercase", input_data_field="text"),
+            LLMSkill(name="skill_1", instructions="Reverse", input_data_field="skill_0"),
+        ]
+    )
+    # 2 batches with the default batch size of 100
+    df = pd.DataFrame({'text': [f'text {i}' for i in range(150)]})
+    runtime = OpenAIRuntime()
+
+    predictions = skillset.apply_fused(df, runtime=runtime)
+
+    pd.testing.assert_frame_equal(predictions, skillset.apply(df, runtime=runtime))
+    pd.testing.assert_frame_equal(predictions, df.assign(
+        skill_0=df['text'].str.upper(),
+        skill_1=df['text'].str.upper().str[::-1]
+    ))
@@ -39,3 +39,59 @@ def test_process_batch():
         ['Hello, World!', 'World', {'World': -0.1, 'Test': -0.2}],
         ['Hello, Test!', 'Test', {'World': 0.2, 'Test': 0.1}]
     ], columns=['output', 'label', 'logprobs']))
+
+
+@patching(
+    target_function=PatchedCalls.OPENAI_MODEL_LIST.value,
+    data=[{'input': {}, 'output': {'data': [{'id': 'gpt-3.5-turbo-instruct'}]}}],
+)
+@patching(
+    target_function=PatchedCalls.GUIDANCE.value,
+    data=[
+        {'input': {'text_': 'Hello'}, 'output': {'output': 'Hello'}},
+        {'input': {'text_': 'Test'}, 'output': {'output': 'Test'}},
+    ] * 2,
+)
+def test_process_batch_reuses_programs():
+    from unittest.mock import patch
+    from adala.utils.internal_data import InternalDataFrame
+    from adala.runtimes.openai import OpenAIRuntime
+
+    runtime = OpenAIRuntime()
+    kwargs = dict(
+        batch=InternalDataFrame({'text': ['Hello', 'Test']}),
+        input_template='Input: {{text}}',
+        output_template="Output: {{gen 'output'}}",
+        instructions='This is a test.',
+    )
+    runtime.process_batch(**kwargs)
+    programs = dict(runtime._programs)
+    runtime.process_batch(**kwargs)
+
+    # input, output and instructions programs are compiled once
+    assert len(programs) == 3
+    assert all(runtime._programs[key] is program for key, program in programs.items())
+
+    # least recently used programs are evicted
+    with patch.object(OpenAIRuntime, '_PROGRAMS_MAX_SIZE', 2):
+        first = runtime.get_instructions_program('First')
+        runtime.get_instructions_program('Second')
+        assert runtime.get_instructions_program('First') is first
+        runtime.get_instructions_program('Third')
+    assert list(runtime._programs) == [('First', None), ('Third', None)]
+
+
+@patching(
+    target_function=PatchedCalls.OPENAI_MODEL_LIST.value,
+    data=[{'input': {}, 'output': {'data': [{'id': 'gpt-3.5-turbo-instruct'}]}}],
+)
+def test_process_batch_renders_datetime():
+    import pandas as pd
+    from adala.utils.internal_data import InternalDataFrame
+    from adala.runtimes.openai import OpenAIRuntime
+
+    df = InternalDataFrame({'text': ['Hello'], 'date': pd.to_datetime(['2023-01-05'])})
+
+    runtime = OpenAIRuntime()
+    result = runtime.process_batch(batch=df, input_template='Input: {{text}}, Date: {{date}}')
+    assert result.iloc[0, 0] == 'Input: Hello, Date: 2023-01-05 00:00:00'